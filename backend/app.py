@@ -1,15 +1,276 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 import spacy
+import gzip
+import bisect
+import cProfile
+import hashlib
+import io
 import json
 import os
+import pstats
 import random
 import re
+import sys
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from functools import wraps
 from typing import List, Dict, Tuple, Optional
 from fuzzywuzzy import process, fuzz
+from werkzeug.middleware.proxy_fix import ProxyFix
+import numpy as np
+import stat_embeddings
+from stat_synonyms import STAT_SYNONYMS
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["ETag"])
+
+# Number of reverse proxies in front of us. Only then is X-Forwarded-For trusted (and only
+# the hops those proxies appended); otherwise request.remote_addr is the peer address.
+# NB: behind a same-host proxy without this set, every client looks like 127.0.0.1, which the
+# profiling hooks treat as local (see is_admin); set PROFILE_ADMIN_TOKEN in that setup.
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 0))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# ---------------------------
+# Admission control
+# ---------------------------
+# spaCy parses and fuzzy scans are CPU-bound, so we only let as many run at once as we
+# have cores. Everything else waits in a bounded queue; anything that waits past its
+# deadline (or arrives when the queue is full) is shed instead of being answered late.
+MAX_CONCURRENCY = int(os.environ.get("CHAT_MAX_CONCURRENCY", os.cpu_count() or 1))
+MAX_QUEUE_DEPTH = int(os.environ.get("CHAT_MAX_QUEUE", MAX_CONCURRENCY * 4))
+QUEUE_DEADLINE_S = float(os.environ.get("CHAT_QUEUE_DEADLINE", 2.0))
+RATE_PER_SEC = float(os.environ.get("CHAT_RATE_PER_SEC", 2.0))   # per-client refill rate
+RATE_BURST = float(os.environ.get("CHAT_RATE_BURST", 10.0))      # per-client bucket size
+MAX_BUCKETS = int(os.environ.get("CHAT_MAX_BUCKETS", 10000))     # clients tracked at once
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+class AdmissionController:
+    def __init__(self, concurrency: int, max_queue: int, deadline: float, rate: float, burst: float):
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.rate = rate
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()   # least recently used first
+        self.stats = {"queued": 0, "in_flight": 0, "admitted": 0,
+                      "shed_rate_limited": 0, "shed_queue_full": 0, "shed_deadline": 0}
+
+    def allow_client(self, client: str) -> bool:
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                # Keep the table bounded by dropping the least recently seen clients. Those have
+                # usually been idle long enough to refill, so a fresh bucket behaves the same.
+                while len(self.buckets) >= MAX_BUCKETS:
+                    self.buckets.popitem(last=False)
+                bucket = self.buckets[client] = TokenBucket(self.rate, self.burst)
+            else:
+                self.buckets.move_to_end(client)
+            return bucket.take()
+
+    def acquire(self, client: str) -> Optional[Tuple[int, str]]:
+        """Returns None when admitted, otherwise (status_code, reason) for a shed request."""
+        if not self.allow_client(client):
+            with self.lock:
+                self.stats["shed_rate_limited"] += 1
+            return 429, "rate_limited"
+        with self.lock:
+            if self.stats["queued"] >= self.max_queue:
+                self.stats["shed_queue_full"] += 1
+                return 503, "queue_full"
+            self.stats["queued"] += 1
+        got_slot = self.slots.acquire(timeout=self.deadline)
+        with self.lock:
+            self.stats["queued"] -= 1
+            if not got_slot:
+                self.stats["shed_deadline"] += 1
+                return 503, "deadline_exceeded"
+            self.stats["in_flight"] += 1
+            self.stats["admitted"] += 1
+        return None
+
+    def release(self):
+        with self.lock:
+            self.stats["in_flight"] -= 1
+        self.slots.release()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.stats, max_concurrency=MAX_CONCURRENCY, max_queue=self.max_queue)
+
+admission = AdmissionController(MAX_CONCURRENCY, MAX_QUEUE_DEPTH, QUEUE_DEADLINE_S, RATE_PER_SEC, RATE_BURST)
+
+def admission_controlled(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        client = request.remote_addr or "unknown"   # ProxyFix rewrites this when TRUSTED_PROXIES is set
+        shed = admission.acquire(client)
+        if shed is not None:
+            status, reason = shed
+            resp = jsonify({"response": "I’m a bit swamped right now — give me a second and try again. 🙏",
+                            "error": reason})
+            resp.status_code = status
+            resp.headers["Retry-After"] = "1"
+            return resp
+        try:
+            return view(*args, **kwargs)
+        finally:
+            admission.release()
+    return wrapper
+
+# ---------------------------
+# On-demand profiling
+# ---------------------------
+# Off by default. A single /chat call can be profiled with an `X-Profile: cprofile` (deterministic,
+# with call counts) or `X-Profile: sample` (stack sampler, flamegraph-ready) header, and a fraction
+# of all traffic can be sampled continuously via PROFILE_SAMPLE_RATE or POST /admin/profiling.
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+if PROFILE_MAX_FILES < 1:
+    raise ValueError("PROFILE_MAX_FILES must be at least 1")
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN")
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.001))
+profiling_config = {
+    "sample_rate": float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0)),
+    "mode": os.environ.get("PROFILE_MODE", "sample"),   # mode used for continuous sampling
+}
+PROFILE_MODES = ("cprofile", "sample")
+profile_lock = threading.Lock()
+# Only one cProfile can be active per process (enforced on 3.12+), so runs never overlap
+cprofile_lock = threading.Lock()
+
+def is_admin(require_token: bool = False) -> bool:
+    # With no token configured, only trust callers on the same machine (unless the caller
+    # needs a token regardless, e.g. for changing the sampling config)
+    if PROFILE_ADMIN_TOKEN:
+        return request.headers.get("X-Admin-Token") == PROFILE_ADMIN_TOKEN
+    if require_token:
+        return False
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and aggregates collapsed stacks."""
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Dict[str, int] = {}
+        self.running = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.running.set()
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.thread.join()
+
+    def run(self):
+        while self.running.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {n}" for stack, n in sorted(self.counts.items())) + "\n"
+
+# pstats filters on a regex over the full file path: match our backend directory only
+OWN_CODE_PATTERN = re.escape(os.path.dirname(os.path.abspath(__file__)) + os.sep)
+
+def prune_profiles():
+    files = sorted((os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)), key=os.path.getmtime)
+    for path in files[:-PROFILE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def write_profile(name: str, profiler: Optional[cProfile.Profile], sampler: Optional[StackSampler]):
+    with profile_lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, name)
+        if profiler is not None:
+            profiler.dump_stats(base + ".prof")
+            # Human-readable call counts, restricted to our own functions
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(OWN_CODE_PATTERN)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(out.getvalue())
+        if sampler is not None:
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                f.write(sampler.collapsed())
+        prune_profiles()
+
+def profiled(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        mode = None
+        requested = request.headers.get("X-Profile", "").strip().lower()
+        if requested in PROFILE_MODES and is_admin():
+            mode = requested
+        elif profiling_config["sample_rate"] > 0 and random.random() < profiling_config["sample_rate"]:
+            mode = profiling_config["mode"]
+        if mode is None:
+            return view(*args, **kwargs)
+
+        profiler, sampler = None, None
+        if mode == "cprofile":
+            # Another request is already being cProfiled: serve this one unprofiled
+            if not cprofile_lock.acquire(blocking=False):
+                return view(*args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:   # some other profiler already owns the hook
+                cprofile_lock.release()
+                return view(*args, **kwargs)
+        else:
+            sampler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL)
+            sampler.start()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+                cprofile_lock.release()
+            else:
+                sampler.stop()
+            name = f"{view.__name__}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}-{mode}"
+            # Profiling must never fail the request it is observing
+            try:
+                write_profile(name, profiler, sampler)
+            except Exception:
+                app.logger.exception("Failed to write profile %s", name)
+    return wrapper
 
 # ---------------------------
 # Load NLP
@@ -21,123 +282,107 @@ nlp = spacy.load("en_core_web_sm", disable=["textcat"])
 # Load data
 # ---------------------------
 JSON_PATH = os.path.join(os.path.dirname(__file__), "..", "sports-chatbot", "public", "player_stats.json")
-with open(JSON_PATH, "r", encoding="utf-8") as f:
-    data_list = json.load(f)
+with open(JSON_PATH, "rb") as f:
+    raw_data = f.read()
+    data_list = json.loads(raw_data.decode("utf-8"))
     # Normalize keys to strings, keep original dict per player
     players_data: Dict[str, Dict] = {p["player"]: p for p in data_list}
 
+# Changes whenever the stats file does, so cached answers/ETags go stale with it
+DATA_VERSION = hashlib.sha1(raw_data).hexdigest()[:12]
+
 ALL_PLAYER_NAMES = list(players_data.keys())
+KNOWN_TEAMS = {p["team"] for p in players_data.values() if p.get("team")}
 
 # ---------------------------
 # Stat keywords / synonyms
 # ---------------------------
-# Expandable: add any phrasing you expect from users. Keys are *phrases* you might see.
-STAT_SYNONYMS = {
-    # Basic info
-    "team": "team", "club": "team",
-    "player": "player", "name": "player",
-    "position": "position", "role": "position",
-    "age": "age", "born": "born", "dob": "born",
-    "nation": "nation", "nationality": "nation",
-    "country": "nation", "plays for": "nation", "represents": "nation",
-    "represents country": "nation", "national team": "nation",
-    "which country": "nation", "his nation": "nation",
-
-    # Appearances & minutes
-    "appearance": "matches_played", "appearances": "matches_played", "games": "matches_played",
-    "matches": "matches_played", "apps": "matches_played",
-    "starts": "starts",
-    "minutes": "minutes_played", "minutes played": "minutes_played",
-    "full matches": "full_matches_played",
-
-    # Goals & assists
-    "goal": "goals", "goals": "goals", "scored": "goals", "scores": "goals",
-    "non penalty goals": "non_penalty_goals",
-    "goals per 90": "goals_per_90", "g/90": "goals_per_90",
-    "assist": "assists", "assists": "assists",
-    "assists per 90": "assists_per_90", "a/90": "assists_per_90",
-    "g+a": "goal_involvements", "goal contributions": "goal_involvements",
-    "non penalty g+a": "non_penalty_goal_involvements",
-
-    # Expected goals & assists
-    "expected goal": "expected_goals", "expected goals": "expected_goals", "xg": "expected_goals",
-    "npxg": "non_penalty_expected_goals",
-    "npxg/shot": "non_penalty_expected_goals_per_shot",
-    "expected assist": "expected_assists", "expected assists": "expected_assists", "xa": "expected_assists",
-    "xag": "expected_assists",
-    "xg+xag": "expected_goal_involvements",
-    "npxg+xag": "non_penalty_expected_goal_involvements",
-    "goals minus xg": "goals_minus_expected",
-    "non penalty goals minus xg": "non_penalty_goals_minus_expected",
-
-    # Shooting
-    "shot": "shots", "shots": "shots",
-    "shots per 90": "shots_per_90",
-    "on target": "shots_on_target", "shots on target": "shots_on_target",
-    "shots on target per 90": "shots_on_target_per_90",
-    "shot accuracy": "shots_on_target_pct", "accuracy": "shots_on_target_pct",
-    "goals per shot": "goals_per_shot",
-    "goals per shot on target": "goals_per_shot_on_target",
-    "distance": "average_shot_distance", "avg shot distance": "average_shot_distance",
-    "free kick": "free_kicks", "free kicks": "free_kicks",
-    "penalty": "penalties_scored", "penalties": "penalties_scored", "pens": "penalties_scored",
-    "penalty attempts": "penalty_attempts",
-
-    # Passing & carrying
-    "progressive carries": "progressive_carries", "prog carries": "progressive_carries",
-    "progressive passes": "progressive_passes", "prog passes": "progressive_passes",
-    "progressive runs": "progressive_receives", "prog runs": "progressive_receives",
-    "cross": "crosses", "crosses": "crosses",
-
-    # Defensive
-    "tackle": "tackles_won", "tackles": "tackles_won",
-    "interception": "interceptions", "interceptions": "interceptions",
-    "recovery": "recoveries", "recoveries": "recoveries",
-    "duels won": "duels_won", "duels lost": "duels_lost",
-    "duel win%": "duel_win_pct", "win%": "duel_win_pct",
-
-    # Discipline
-    "foul": "fouls_committed", "fouls": "fouls_committed",
-    "fouled": "fouled",
-    "offside": "offsides", "offsides": "offsides",
-    "yellow card": "yellow_cards", "yellow cards": "yellow_cards",
-    "second yellow": "second_yellow_cards", "second yellow cards": "second_yellow_cards",
-    "red card": "red_cards", "red cards": "red_cards",
-    "own goal": "own_goals", "own goals": "own_goals",
-
-    # Penalties (won/conceded/saved)
-    "penalty won": "penalties_won", "penalties won": "penalties_won",
-    "penalty conceded": "penalties_conceded", "penalties conceded": "penalties_conceded",
-    "penalties against": "penalties_against",
-    "penalties faced": "penalties_faced",
-    "penalties saved": "penalties_saved",
-    "penalties missed": "penalties_missed",
-
-    # Keeper stats
-    "saves": "saves",
-    "shots on target against": "shots_on_target_against",
-    "goals against": "goals_against", "conceded": "goals_against",
-    "goals against per 90": "goals_against_per_90", "ga/90": "goals_against_per_90",
-    "save%": "keepers_Save%", "keepers save%": "keepers_Save%",
-    "clean sheet": "clean_sheets", "clean sheets": "clean_sheets",
-    "clean sheet%": "clean_sheet_pct",
-
-    # Match results
-    "wins": "wins", "win": "wins",
-    "draws": "draws", "draw": "draws",
-    "losses": "losses", "loss": "losses",
-}
-
-
+# STAT_SYNONYMS lives in stat_synonyms.py so the offline embedding build can share it.
 CANON_TO_PHRASES = {}
 for k, v in STAT_SYNONYMS.items():
     CANON_TO_PHRASES.setdefault(v, set()).add(k)
 
 CANON_STATS = list(CANON_TO_PHRASES.keys())
 
+# Precomputed embedding matrix for every synonym + stat description (see stat_embeddings.py)
+STAT_MATRIX, STAT_MATRIX_LABELS, TYPO_MATRIX, TYPO_LABELS = stat_embeddings.load_matrix(STAT_SYNONYMS)
+SEMANTIC_THRESHOLD = 0.9
+TYPO_THRESHOLD = 0.7
+
 # Superlative markers
 SUPERLATIVE_MARKERS = {"most", "highest", "best", "top", "leading", "leader", "highest number", "max"}
 
+# ---------------------------
+# Typeahead index
+# ---------------------------
+# Sorted array of accent-folded keys (full names plus every word-suffix, so "saka" and
+# "bukayo sa" both hit "Bukayo Saka"); a lookup is one bisect plus a short forward scan.
+SUGGEST_SCAN_LIMIT = 2000
+
+def fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+def as_number(val) -> float:
+    try:
+        return float(str(val).replace(",", "").replace("%", "").strip())
+    except Exception:
+        return 0.0
+
+def build_suggest_index() -> Tuple[List[str], List[Tuple[int, bool]], List[Dict]]:
+    entries: List[Dict] = []
+    team_minutes: Dict[str, float] = {}
+    for name, pdata in players_data.items():
+        minutes = as_number(pdata.get("minutes_played"))
+        entries.append({"text": name, "type": "player", "value": name, "weight": minutes})
+        team = pdata.get("team")
+        if team:
+            team_minutes[team] = team_minutes.get(team, 0.0) + minutes
+    for team, minutes in team_minutes.items():
+        entries.append({"text": team, "type": "team", "value": team, "weight": minutes})
+    for phrase, canon in STAT_SYNONYMS.items():
+        # No usage data for stats; more synonyms ~ more commonly asked about
+        entries.append({"text": phrase, "type": "stat", "value": canon, "weight": float(len(CANON_TO_PHRASES[canon]))})
+
+    # Minutes, squad minutes and synonym counts aren't comparable, so scale each type to 0..1:
+    # the most popular player, team and stat rank level with each other.
+    top: Dict[str, float] = {}
+    for entry in entries:
+        top[entry["type"]] = max(top.get(entry["type"], 0.0), entry["weight"])
+    for entry in entries:
+        entry["weight"] = entry["weight"] / top[entry["type"]] if top[entry["type"]] else 0.0
+
+    pairs = []
+    for i, entry in enumerate(entries):
+        words = fold(entry["text"]).split()
+        for start in range(len(words)):
+            pairs.append((" ".join(words[start:]), (i, start == 0)))
+    pairs.sort()
+    return [k for k, _ in pairs], [ref for _, ref in pairs], entries
+
+SUGGEST_KEYS, SUGGEST_IDS, SUGGEST_ENTRIES = build_suggest_index()
+
+def suggest(prefix: str, limit: int = 8) -> List[Dict]:
+    prefix = fold(prefix)
+    if not prefix:
+        return []
+    start = bisect.bisect_left(SUGGEST_KEYS, prefix)
+    hits: Dict[Tuple[str, str], Tuple[Tuple[bool, bool, float], Dict]] = {}
+    for pos in range(start, min(start + SUGGEST_SCAN_LIMIT, len(SUGGEST_KEYS))):
+        key = SUGGEST_KEYS[pos]
+        if not key.startswith(prefix):
+            break
+        entry_id, is_head = SUGGEST_IDS[pos]
+        entry = SUGGEST_ENTRIES[entry_id]
+        # Exact full-name matches first, then matches on the start of the name, then by weight;
+        # a word-suffix hit ("second yellow" for "yellow") never beats a name-start hit
+        rank = (is_head and key == prefix, is_head, entry["weight"])
+        dedupe = (entry["type"], entry["value"])   # one row per canonical stat, not per synonym
+        if dedupe not in hits or rank > hits[dedupe][0]:
+            hits[dedupe] = (rank, entry)
+    ranked = sorted(hits.values(), key=lambda h: h[0], reverse=True)[:limit]
+    return [{"text": e["text"], "type": e["type"], "value": e["value"]} for _, e in ranked]
+
 # ---------------------------
 # Fuzzy helpers
 # ---------------------------
@@ -146,6 +391,31 @@ def fuzzy_find_players(text: str, limit: int = 5, threshold: int = 80) -> List[s
     matches = process.extract(text, ALL_PLAYER_NAMES, limit=limit, scorer=fuzz.token_set_ratio)
     return [name for name, score in matches if score >= threshold]
 
+def semantic_match_stats(text: str, threshold: float = SEMANTIC_THRESHOLD,
+                         typo_threshold: float = TYPO_THRESHOLD) -> List[str]:
+    """
+    Score query n-grams against the phrase matrix in one matmul and keep confident hits.
+    Longer words no hit covered then get one more matmul against the char-trigram matrix,
+    which is what catches typos like "asists".
+    """
+    grams = stat_embeddings.query_ngrams(text)
+    if not grams:
+        return []
+    scores = stat_embeddings.encode_batch(grams) @ STAT_MATRIX.T
+    found = {STAT_MATRIX_LABELS[i] for i in np.flatnonzero(scores.max(axis=0) >= threshold)}
+
+    hit_grams = scores.max(axis=1) >= threshold
+    covered = {w for gram, hit in zip(grams, hit_grams) if hit for w in gram.split()}
+    loose = [gram for gram in grams
+             if " " not in gram and len(gram) >= stat_embeddings.TYPO_MIN_LEN and gram not in covered]
+    if loose:
+        typo_scores = stat_embeddings.encode_chars_batch(loose) @ TYPO_MATRIX.T
+        for row in typo_scores:
+            best = int(row.argmax())
+            if row[best] >= typo_threshold:
+                found.add(TYPO_LABELS[best])
+    return list(found)
+
 def fuzzy_match_stat_phrases(text: str, threshold: int = 85) -> List[str]:
     """Return canonical stat keys mentioned in text (robust to phrasing)."""
     found = set()
@@ -189,7 +459,8 @@ def extract_players(doc) -> List[str]:
 
 def extract_stats(doc) -> List[str]:
     text = doc.text.lower()
-    return fuzzy_match_stat_phrases(text)
+    # Semantic matcher (paraphrases + typos) first; the slower fuzzy scan only as a fallback
+    return semantic_match_stats(text) or fuzzy_match_stat_phrases(text)
 
 def extract_superlative(doc) -> bool:
     text = doc.text.lower()
@@ -345,15 +616,163 @@ def response_help() -> str:
         "Try things like:\n• " + "\n• ".join(examples)
     )
 
+# ---------------------------
+# Payload encoding
+# ---------------------------
+# orjson is a lot quicker on the big "all stats" answers; fall back to compact stdlib json.
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+
+def row_value(val):
+    """Typed value for structured rows: None when missing, numbers as int/float, text as-is."""
+    if val is None or val == "—":
+        return None
+    if isinstance(val, bool):
+        return val
+    if isinstance(val, (int, float)):
+        num = float(val)
+    else:
+        try:
+            num = float(str(val).replace(",", "").replace("%", "").strip())
+        except ValueError:
+            return val   # e.g. team, position, "24-322" ages
+    return int(num) if num.is_integer() else num
+
+def stat_row(player: str, stat: str, val, rank: Optional[int] = None) -> Dict:
+    return {"player": player, "stat": stat, "value": row_value(val), "rank": rank}
+
+def stat_rows(player: str, picked: Dict[str, str], rank: Optional[int] = None) -> List[Dict]:
+    return [stat_row(player, stat, val, rank) for stat, val in picked.items()]
+
+def respond(body: Dict, rows: Optional[List[Dict]] = None, cacheable: bool = False) -> Response:
+    """
+    Build the /chat response. Typed rows are only attached when the client asked for
+    structured mode; cacheable answers (pure data lookups) on GET get an ETag. It is weak
+    because the identity, gzip and br bodies differ byte-for-byte.
+    """
+    if rows is not None and g.get("structured"):
+        body = dict(body, rows=rows)
+    resp = Response(dumps(body), mimetype="application/json")
+    if cacheable and g.get("etag") and request.method in ("GET", "HEAD"):
+        resp.set_etag(g.etag, weak=True)
+        resp.headers["Cache-Control"] = "no-cache"   # always revalidate
+    return resp
+
+def chat_payload() -> Dict:
+    """POST takes a JSON body; GET/HEAD take the same fields as query args so lookups can be conditional."""
+    if request.method in ("GET", "HEAD"):
+        args = request.args
+        payload = {"query": args.get("query", ""), "structured": args.get("structured") in ("1", "true")}
+        if args.get("last_player"):
+            payload["context"] = {"last_player": args["last_player"]}
+        if args.get("entities"):
+            try:
+                payload["entities"] = json.loads(args["entities"])
+            except ValueError:
+                # Keep the raw string so parse_entities rejects it with the same 400 as POST
+                payload["entities"] = args["entities"]
+        return payload
+    payload = request.get_json(silent=True)
+    return payload if isinstance(payload, dict) else {}
+
+def parse_entities(raw) -> Optional[List[Dict[str, str]]]:
+    """`entities` must be a list of {"type": str, "value": str}; None if it isn't."""
+    if raw is None:
+        return []
+    if not isinstance(raw, list):
+        return None
+    entities = []
+    for ent in raw:
+        if not isinstance(ent, dict) or not isinstance(ent.get("type"), str) or not isinstance(ent.get("value"), str):
+            return None
+        entities.append({"type": ent["type"], "value": ent["value"]})
+    return entities
+
+def parse_last_player(raw) -> Optional[str]:
+    """`context` must be an object whose optional last_player is a string; None if it isn't."""
+    if raw is None:
+        return ""
+    if not isinstance(raw, dict):
+        return None
+    last_player = raw.get("last_player")
+    if last_player is None:
+        return ""
+    return last_player if isinstance(last_player, str) else None
+
+def bad_request(error: str) -> Response:
+    resp = respond({"response": "Something looked off with that request — mind trying again?", "error": error})
+    resp.status_code = 400
+    return resp
+
+def request_etag(user_input: str, last_player: str, entities: List[Dict[str, str]]) -> str:
+    # Same data + same question (+ same follow-up context) => same answer
+    resolved = ",".join(sorted(f"{e['type']}:{e['value']}" for e in entities))
+    key = "|".join([DATA_VERSION, user_input.lower(), last_player, resolved, "s" if g.get("structured") else "t"])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+@app.after_request
+def compress_response(resp: Response) -> Response:
+    if resp.direct_passthrough or resp.status_code != 200 or "Content-Encoding" in resp.headers:
+        return resp
+    if resp.mimetype != "application/json":
+        return resp
+    data = resp.get_data()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return resp
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        resp.set_data(brotli.compress(data, quality=4))
+        resp.headers["Content-Encoding"] = "br"
+    elif accepted["gzip"]:
+        resp.set_data(gzip.compress(data, compresslevel=5))
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    return resp
+
 # ---------------------------
 # Chat endpoint
 # ---------------------------
-@app.route("/chat", methods=["POST"])
+@app.route("/chat", methods=["GET", "POST"])
+@admission_controlled
+@profiled
 def chat():
-    payload = request.json or {}
-    user_input = (payload.get("query") or "").strip()
+    payload = chat_payload()
+    user_input = str(payload.get("query") or "").strip()
+    # Opt-in typed rows (player, stat, value, rank) alongside the text answer
+    g.structured = bool(payload.get("structured")) or request.args.get("format") == "structured"
     if not user_input:
-        return jsonify({"response": "Tell me what you’d like to know — a player, a stat, a comparison… I’ve got you. 😊"})
+        return respond({"response": "Tell me what you’d like to know — a player, a stat, a comparison… I’ve got you. 😊"})
+    entities = parse_entities(payload.get("entities"))
+    if entities is None:
+        return bad_request("entities must be a list of {type, value} objects")
+    last_player = parse_last_player(payload.get("context"))
+    if last_player is None:
+        return bad_request("context must be an object with a string last_player")
+
+    # Repeat lookups: answer 304 before doing any NLP work. A matching If-None-Match on
+    # anything but GET/HEAD is a failed precondition (412), per RFC 9110.
+    g.etag = request_etag(user_input, last_player, entities)
+    if request.if_none_match.contains_weak(g.etag):
+        if request.method not in ("GET", "HEAD"):
+            return Response(status=412)
+        resp = Response(status=304)
+        resp.set_etag(g.etag, weak=True)
+        return resp
 
     doc = nlp(user_input)
 
@@ -367,9 +786,19 @@ def chat():
     is_superlative = extract_superlative(doc)
     team_constraint = extract_team_constraint(doc)
 
+    # Entities the client already resolved via /suggest (validated at the top of chat())
+    for ent in entities:
+        kind, value = ent["type"], ent["value"]
+        if kind == "player" and value in players_data and value not in matched_players:
+            matched_players.append(value)
+        elif kind == "stat" and value in CANON_TO_PHRASES and value not in requested_stats:
+            requested_stats.append(value)
+        elif kind == "team" and value in KNOWN_TEAMS:
+            team_constraint = value
+
     # If user explicitly asked for "help" / "what can I ask"
     if re.search(r"\b(help|how to|what can i ask|examples|commands)\b", text_lower):
-        return jsonify({"response": response_help()})
+        return respond({"response": response_help()})
 
     intent = detect_intent(matched_players, requested_stats, is_superlative)
 
@@ -378,9 +807,10 @@ def chat():
     # ---------------------------
     if intent == Intent.LEADERBOARD:
         if not requested_stats:
-            return jsonify({"response": "Which stat would you like the leader for? (e.g., goals, assists, xG)"})
+            return respond({"response": "Which stat would you like the leader for? (e.g., goals, assists, xG)"})
         # If multiple stats, answer for the first one mentioned (or iterate)
         answers = []
+        rows = []
         for stat in requested_stats:
             result = query_leaderboard(stat, team_constraint)
             if result is None:
@@ -391,18 +821,20 @@ def chat():
                     answers.append(f"I couldn’t find a clear leader for {pretty}.")
                 continue
             name, val = result
+            rows.append(stat_row(name, stat, players_data[name].get(stat), rank=1))
             pretty = stat.replace("_", " ")
             if team_constraint:
                 answers.append(f"{random.choice(ACKS)} The {pretty} leader for {team_constraint} is {name} with {val}.")
             else:
                 answers.append(f"{random.choice(ACKS)} The {pretty} leader is {name} with {val}.")
-        return jsonify({"response": "\n".join(answers)})
+        return respond({"response": "\n".join(answers)}, rows=rows, cacheable=True)
 
     if intent == Intent.COMPARE_PLAYERS:
         if not requested_stats:
-            return jsonify({"response": "Which stat should I compare? (e.g., goals, assists, xG)"})
+            return respond({"response": "Which stat should I compare? (e.g., goals, assists, xG)"})
         # Compare on first requested stat (or all)
         lines = []
+        table = []
         for stat in requested_stats:
             # Build a sorted table for the stat
             rows = []
@@ -414,6 +846,8 @@ def chat():
                     v = None
                 rows.append((p, v, val))
             rows.sort(key=lambda r: (r[1] is None, -(r[1] or -1e18)))
+            table.extend(stat_row(p, stat, display, rank=i + 1)
+                         for i, (p, _, display) in enumerate(rows) if display != "—")
             pretty = stat.replace("_", " ")
             # Format
             ranking = " > ".join([f"{p} ({display})" for p, _, display in rows if display != "—"])
@@ -426,26 +860,27 @@ def chat():
             "Let’s line them up:",
             "Side-by-side, this is what we’ve got:"
         ])
-        return jsonify({"response": opener + "\n" + "\n".join(lines)})
+        return respond({"response": opener + "\n" + "\n".join(lines)}, rows=table, cacheable=True)
 
     if intent == Intent.GET_PLAYER_STATS:
         if not matched_players and requested_stats:
             # If stat is found but no player explicitly mentioned,
             # check if the last conversation had a player (context).
-            last_player = payload.get("context", {}).get("last_player")
             if last_player:
                 matched_players = [last_player]
 
         if matched_players and requested_stats:
             q = query_player_stats(matched_players, requested_stats, all_stats=False)
             responses = []
+            rows = []
             for player, picked in q:
                 responses.append(friendly_stat_sentence(player, picked))
+                rows.extend(stat_rows(player, picked))
             # Store last player in context for follow-ups
-            return jsonify({
+            return respond({
                 "response": "\n".join(responses),
                 "context": {"last_player": matched_players[-1]}
-            })
+            }, rows=rows, cacheable=True)
 
 
         # If they asked something like "goals scored by saka" we already have stat+player
@@ -459,10 +894,11 @@ def chat():
                 if key in pdata:
                     teasers.append(f"{key.replace('_', ' ')}: {pdata[key]}")
             if teasers:
-                return jsonify({"response": f"What would you like to know about {p}? For example — {', '.join(teasers)}."})
-            return jsonify({"response": f"What would you like to know about {p}? (goals, assists, xG, minutes…)"})
+                return respond({"response": f"What would you like to know about {p}? For example — {', '.join(teasers)}."})
+            return respond({"response": f"What would you like to know about {p}? (goals, assists, xG, minutes…)"})
 
         results = []
+        rows = []
         # If all stats: dump everything per player
         if all_stats_requested:
             for p in matched_players:
@@ -470,28 +906,76 @@ def chat():
                 if not pdata:
                     continue
                 results.append(render_full_block(p, pdata))
-            return jsonify({"response": "\n\n".join(results)})
+                rows.extend(stat_rows(p, pdata))
+            return respond({"response": "\n\n".join(results)}, rows=rows, cacheable=True)
 
         # Else: pick the requested stats and speak naturally
         q = query_player_stats(matched_players, requested_stats, all_stats=False)
         for player, picked in q:
             results.append(friendly_stat_sentence(player, picked))
-        return jsonify({"response": "\n".join(results)})
+            rows.extend(stat_rows(player, picked))
+        return respond({"response": "\n".join(results)}, rows=rows, cacheable=True)
 
     if intent == Intent.UNKNOWN:
         # Try to at least identify a player or a stat and guide the user
         maybe_players = extract_players(doc)
         maybe_stats = extract_stats(doc)
         if maybe_players and not maybe_stats:
-            return jsonify({"response": f"What would you like to know about {natural_join(maybe_players)}? (e.g., goals, assists, xG)"} )
+            return respond({"response": f"What would you like to know about {natural_join(maybe_players)}? (e.g., goals, assists, xG)"} )
         if maybe_stats and not maybe_players:
             pretty = natural_join([s.replace("_", " ") for s in maybe_stats])
-            return jsonify({"response": f"Got it — {pretty}. Which player should I look up?"})
-        return jsonify({"response": "I didn’t quite catch that. You can ask things like: 'How many goals has Saka scored?' or 'Which player has the most assists?'"})
+            return respond({"response": f"Got it — {pretty}. Which player should I look up?"})
+        return respond({"response": "I didn’t quite catch that. You can ask things like: 'How many goals has Saka scored?' or 'Which player has the most assists?'"})
 
     # Fallback (shouldn’t reach)
-    return jsonify({"response": "Something went odd on my side — mind rephrasing that? 🙏"})
+    return respond({"response": "Something went odd on my side — mind rephrasing that? 🙏"})
+
+@app.route("/suggest", methods=["GET"])
+def suggest_endpoint():
+    """
+    Typeahead for the chat input. Tries the last 3, 2, then 1 words of `q` so multi-word
+    names complete; `fragment` is the part of `q` the suggestions would replace.
+    """
+    q = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 8, type=int), 1), 20)
+    words = q.split()
+    fragment, results = "", []
+    for n in range(min(3, len(words)), 0, -1):
+        fragment = " ".join(words[-n:])
+        results = suggest(fragment, limit)
+        if results:
+            break
+    return Response(dumps({"fragment": fragment if results else "", "suggestions": results}),
+                    mimetype="application/json")
+
+@app.route("/admission", methods=["GET"])
+def admission_stats():
+    # Queue depth / shed counters for watching p99 during matchday spikes
+    return jsonify(admission.snapshot())
+
+@app.route("/admin/profiling", methods=["GET", "POST"])
+def profiling_admin():
+    # Reading the config is fine locally; changing it always needs PROFILE_ADMIN_TOKEN
+    if not is_admin(require_token=request.method == "POST"):
+        return jsonify({"error": "forbidden"}), 403
+    if request.method == "POST":
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({"error": "expected a JSON object"}), 400
+        if "sample_rate" in payload:
+            try:
+                rate = float(payload["sample_rate"])
+            except (TypeError, ValueError):
+                return jsonify({"error": "sample_rate must be a number"}), 400
+            if rate != rate:   # NaN
+                return jsonify({"error": "sample_rate must be a number"}), 400
+            profiling_config["sample_rate"] = min(max(rate, 0.0), 1.0)
+        if "mode" in payload:
+            if payload["mode"] not in PROFILE_MODES:
+                return jsonify({"error": f"mode must be one of {', '.join(PROFILE_MODES)}"}), 400
+            profiling_config["mode"] = payload["mode"]
+    return jsonify(dict(profiling_config, dir=PROFILE_DIR, max_files=PROFILE_MAX_FILES))
 
 
 if __name__ == "__main__":
-    app.run(port=5000, debug=True)
+    app.run(port=5000, debug=True, threaded=True)
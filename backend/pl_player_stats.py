@@ -1,12 +1,119 @@
 import requests
 from bs4 import BeautifulSoup, Comment
 import json
+import os
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 import pandas as pd
 import unicodedata
 
 class FBRefScraper:
+    COLUMNS_TO_REMOVE = {
+        "shooting_Player_URL", "shooting_Squad_URL", "shooting_Matches", "shooting_Rk",
+        "misc_Rk", "misc_Player_URL", "misc_Nation", "misc_Pos", "misc_Squad_URL", "misc_Age",
+        "misc_Born", "misc_90s", "misc_Matches",
+        "standard_stats_Rk", "standard_stats_Player_URL", "standard_stats_Nation", "standard_stats_Pos",
+        "standard_stats_Squad_URL", "standard_stats_Age", "standard_stats_Born", "standard_stats_Matches",
+        "keepers_Rk", "keepers_Player_URL", "keepers_Nation", "keepers_Pos", "keepers_Squad_URL",
+        "keepers_Age", "keepers_Born", "keepers_MP", "keepers_Starts", "keepers_Min", "keepers_90s",
+        "keepers_Matches", "standard_stats_90s", "standard_stats_PK", "standard_stats_PKatt",
+        "standard_stats_CrdY", "standard_stats_CrdR", "standard_stats_xG", "standard_stats_npxG"
+    }
+
+    RENAME_MAP = {
+        "Player": "player",
+        "Team": "team",
+        "shooting_Pos": "position",
+        "shooting_Age": "age",
+        "shooting_Born": "born",
+        "shooting_Nation": "nation",
+        "standard_stats_MP": "matches_played",
+        "standard_stats_Starts": "starts",
+        "standard_stats_Min": "minutes_played",
+        "shooting_90s": "full_matches_played",
+        "shooting_Gls": "goals",
+        "standard_stats_Gls": "goals_per_90",
+        "standard_stats_G-PK": "non_penalty_goals",
+        "Assists": "assists",
+        "standard_stats_Ast": "assists_per_90",
+        "standard_stats_G+A": "goal_involvements",
+        "standard_stats_G+A-PK": "non_penalty_goal_involvements",
+        "shooting_G-xG": "goals_minus_expected",
+        "shooting_np:G-xG": "non_penalty_goals_minus_expected",
+        "standard_stats_xAG": "expected_assists",
+        "standard_stats_xG+xAG": "expected_goal_involvements",
+        "standard_stats_npxG+xAG": "non_penalty_expected_goal_involvements",
+        "shooting_Sh": "shots",
+        "shooting_Sh/90": "shots_per_90",
+        "shooting_SoT": "shots_on_target",
+        "shooting_SoT/90": "shots_on_target_per_90",
+        "shooting_SoT%": "shots_on_target_pct",
+        "shooting_G/Sh": "goals_per_shot",
+        "shooting_G/SoT": "goals_per_shot_on_target",
+        "shooting_Dist": "average_shot_distance",
+        "shooting_FK": "free_kicks",
+        "shooting_PK": "penalties_scored",
+        "shooting_PKatt": "penalty_attempts",
+        "shooting_xG": "expected_goals",
+        "shooting_npxG": "non_penalty_expected_goals",
+        "shooting_npxG/Sh": "non_penalty_expected_goals_per_shot",
+        "misc_TklW": "tackles_won",
+        "misc_Int": "interceptions",
+        "misc_Recov": "recoveries",
+        "misc_Won": "duels_won",
+        "misc_Lost": "duels_lost",
+        "misc_Won%": "duel_win_pct",
+        "misc_Fls": "fouls_committed",
+        "misc_Fld": "fouled",
+        "misc_Off": "offsides",
+        "misc_Crs": "crosses",
+        "misc_CrdY": "yellow_cards",
+        "misc_2CrdY": "second_yellow_cards",
+        "misc_CrdR": "red_cards",
+        "misc_OG": "own_goals",
+        "misc_PKwon": "penalties_won",
+        "misc_PKcon": "penalties_conceded",
+        "standard_stats_PrgC": "progressive_carries",
+        "standard_stats_PrgP": "progressive_passes",
+        "standard_stats_PrgR": "progressive_receives",
+        "keepers_Saves": "saves",
+        "keepers_SoTA": "shots_on_target_against",
+        "keepers_GA": "goals_against",
+        "keepers_GA90": "goals_against_per_90",
+        "keepers_CS": "clean_sheets",
+        "keepers_CS%": "clean_sheet_pct",
+        "keepers_PKA": "penalties_against",
+        "keepers_PKatt": "penalties_faced",
+        "keepers_PKsv": "penalties_saved",
+        "keepers_PKm": "penalties_missed",
+        "keepers_W": "wins",
+        "keepers_D": "draws",
+        "keepers_L": "losses",
+    }
+
+    THREE_LETTER_CODES = {
+        "engENG": "England",
+        "wlsWAL": "Wales",
+        "sctSCO": "Scotland",
+        "nirNIR": "Northern Ireland"
+    }
+
+    NATION_MAP = {
+        "en": "England", "nl": "Netherlands", "fr": "France", "br": "Brazil", "es": "Spain",
+        "pt": "Portugal", "de": "Germany", "dk": "Denmark", "ar": "Argentina", "wls": "Wales",
+        "it": "Italy", "be": "Belgium", "sct": "Scotland", "se": "Sweden", "ie": "Republic of Ireland",
+        "no": "Norway", "ci": "Côte d'Ivoire", "sn": "Senegal", "ng": "Nigeria", "ch": "Switzerland",
+        "us": "United States", "nir": "Northern Ireland", "cm": "Cameroon", "jp": "Japan", "co": "Colombia",
+        "ma": "Morocco", "rs": "Serbia", "cd": "Congo DR", "uy": "Uruguay", "cz": "Czech Republic",
+        "mx": "Mexico", "gh": "Ghana", "hu": "Hungary", "eg": "Egypt", "ua": "Ukraine", "py": "Paraguay",
+        "tr": "Türkiye", "pl": "Poland", "kr": "Korea Republic", "si": "Slovenia", "at": "Austria",
+        "hr": "Croatia", "ec": "Ecuador", "mz": "Mozambique", "sk": "Slovakia", "zw": "Zimbabwe",
+        "za": "South Africa", "gm": "Gambia", "nz": "New Zealand", "tn": "Tunisia", "dz": "Algeria",
+        "bg": "Bulgaria", "gw": "Guinea-Bissau", "bf": "Burkina Faso", "ht": "Haiti", "pe": "Peru",
+        "uz": "Uzbekistan", "gr": "Greece", "ge": "Georgia", "is": "Iceland", "il": "Israel",
+        "jm": "Jamaica", "tt": "Trinidad and Tobago"
+    }
+
     def __init__(self, delay: float = 1.0):
         self.delay = delay
         self.session = requests.Session()
@@ -53,6 +160,10 @@ class FBRefScraper:
         return ''.join(c for c in unicodedata.normalize('NFKD', text) if ord(c) < 128)
 
     def extract_table(self, url: str) -> List[Dict[str, Any]]:
+        return list(self.iter_table(url))
+
+    def iter_table(self, url: str) -> Iterator[Dict[str, Any]]:
+        """Rows of the largest table on the page, yielded one at a time."""
         soup = self.get_page(url)
         tables = soup.find_all('table')
         if not tables:
@@ -65,7 +176,6 @@ class FBRefScraper:
         headers = [th.get_text(strip=True) for th in header_rows[-1].find_all(['th', 'td'])]
 
         tbody = table.find('tbody')
-        data = []
         for row in tbody.find_all('tr'):
             if row.get('class') and 'thead' in row.get('class', []):
                 continue
@@ -90,188 +200,103 @@ class FBRefScraper:
                         row_data['Squad_URL'] = link.get('href', '')
                 row_data[header] = self.clean_value(text)
             if team and player:
-                data.append({'team': team, 'player': player, 'stats': row_data})
-        return data
+                yield {'team': team, 'player': player, 'stats': row_data}
 
-    def scrape_and_flatten(self, urls: Dict[str, str], save_file: str = 'player_stats.json') -> pd.DataFrame:
-        flattened_data: list[dict] = []
+    def finalize_player(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Assists, renames, nation and accent cleanup for one merged player record, in a single pass."""
+        # --- Compute total assists as integer ---
+        try:
+            per90_assists = raw.get("standard_stats_Ast", 0.0) or 0.0
+            ninety_minutes = raw.get("shooting_90s", 0) or 0
+            raw["Assists"] = int(round(per90_assists * ninety_minutes))
+        except Exception as e:
+            raw["Assists"] = 0
+            print(f"Error computing Assists for {raw.get('Player')}: {e}")
+
+        # --- Rename keys (renamed keys go last, in RENAME_MAP order) ---
+        player_dict = {k: v for k, v in raw.items() if k not in self.RENAME_MAP}
+        for old_key, new_key in self.RENAME_MAP.items():
+            if old_key in raw:
+                player_dict[new_key] = raw[old_key]
+
+        # --- Normalize nation ---
+        raw_nation = player_dict.get("nation", "")
+        if raw_nation in self.THREE_LETTER_CODES:
+            player_dict["nation"] = self.THREE_LETTER_CODES[raw_nation]
+        elif raw_nation:
+            code = raw_nation[:2].lower()
+            player_dict["nation"] = self.NATION_MAP.get(code, raw_nation)
+        else:
+            player_dict["nation"] = None
+
+        player_dict['player'] = self.remove_accents(player_dict.get('player', ''))
+        return player_dict
+
+    def scrape_and_flatten(self, urls: Dict[str, str], save_file: str = 'player_stats.json',
+                           output_format: str = 'json', build_dataframe: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Scrape every category, merge rows per player and write the cleaned records to save_file.
+        output_format is 'json' (the array the chat server loads) or 'ndjson' (one record per line).
+        The DataFrame is only built when build_dataframe=True.
+        """
+        if output_format not in ('json', 'ndjson'):
+            raise ValueError(f"Unknown output_format: {output_format}")
         player_index: dict[str, dict] = {}  # key = team + player to avoid duplicates
 
-        # --- 1️⃣ Scrape data ---
+        # --- 1️⃣ Scrape data, dropping unwanted columns as rows arrive ---
         for category, url in urls.items():
             print(f"\nScraping {category} stats from: {url}")
             try:
-                data = self.extract_table(url)
-                for item in data:
-                    team = item['team']
-                    player = item['player']
-                    stats = item['stats']
-
-                    key = f"{team}_{player}"
-                    if key not in player_index:
-                        player_index[key] = {'Team': team, 'Player': player}
-
-                    for k, v in stats.items():
-                        if k not in ['Player', 'Squad']:
-                            player_index[key][f"{category}_{k}"] = v
+                for item in self.iter_table(url):
+                    key = f"{item['team']}_{item['player']}"
+                    record = player_index.get(key)
+                    if record is None:
+                        record = player_index[key] = {'Team': item['team'], 'Player': item['player']}
+
+                    for k, v in item['stats'].items():
+                        if k in ('Player', 'Squad'):
+                            continue
+                        col = f"{category}_{k}"
+                        if col not in self.COLUMNS_TO_REMOVE:
+                            record[col] = v
             except Exception as e:
                 print(f"Error scraping {category}: {e}")
 
-        flattened_data = list(player_index.values())
-
-        # --- 2️⃣ Remove unwanted columns ---
-        columns_to_remove = [
-            "shooting_Player_URL", "shooting_Squad_URL", "shooting_Matches", "shooting_Rk",
-            "misc_Rk", "misc_Player_URL", "misc_Nation", "misc_Pos", "misc_Squad_URL", "misc_Age",
-            "misc_Born", "misc_90s", "misc_Matches",
-            "standard_stats_Rk", "standard_stats_Player_URL", "standard_stats_Nation", "standard_stats_Pos",
-            "standard_stats_Squad_URL", "standard_stats_Age", "standard_stats_Born", "standard_stats_Matches",
-            "keepers_Rk", "keepers_Player_URL", "keepers_Nation", "keepers_Pos", "keepers_Squad_URL",
-            "keepers_Age", "keepers_Born", "keepers_MP", "keepers_Starts", "keepers_Min", "keepers_90s",
-            "keepers_Matches", "standard_stats_90s", "standard_stats_PK", "standard_stats_PKatt",
-            "standard_stats_CrdY", "standard_stats_CrdR", "standard_stats_xG", "standard_stats_npxG"
-        ]
-        for player_dict in flattened_data:
-            for col in columns_to_remove:
-                player_dict.pop(col, None)
-
-        # --- 3️⃣ Compute total assists as integer ---
-        for player_dict in flattened_data:
-            try:
-                per90_assists = player_dict.get("standard_stats_Ast", 0.0) or 0.0
-                ninety_minutes = player_dict.get("shooting_90s", 0) or 0
-                player_dict["Assists"] = int(round(per90_assists * ninety_minutes))
-
-            except Exception as e:
-                player_dict["Assists"] = 0
-                print(f"Error computing Assists for {player_dict.get('player')}: {e}")
-
-        # --- 4️⃣ Rename keys ---
-        rename_map = {
-            "Player": "player",
-            "Team": "team",
-            "shooting_Pos": "position",
-            "shooting_Age": "age",
-            "shooting_Born": "born",
-            "shooting_Nation": "nation",
-            "standard_stats_MP": "matches_played",
-            "standard_stats_Starts": "starts",
-            "standard_stats_Min": "minutes_played",
-            "shooting_90s": "full_matches_played",
-            "shooting_Gls": "goals",
-            "standard_stats_Gls": "goals_per_90",
-            "standard_stats_G-PK": "non_penalty_goals",
-            "Assists": "assists",
-            "standard_stats_Ast": "assists_per_90",
-            "standard_stats_G+A": "goal_involvements",
-            "standard_stats_G+A-PK": "non_penalty_goal_involvements",
-            "shooting_G-xG": "goals_minus_expected",
-            "shooting_np:G-xG": "non_penalty_goals_minus_expected",
-            "standard_stats_xAG": "expected_assists",
-            "standard_stats_xG+xAG": "expected_goal_involvements",
-            "standard_stats_npxG+xAG": "non_penalty_expected_goal_involvements",
-            "shooting_Sh": "shots",
-            "shooting_Sh/90": "shots_per_90",
-            "shooting_SoT": "shots_on_target",
-            "shooting_SoT/90": "shots_on_target_per_90",
-            "shooting_SoT%": "shots_on_target_pct",
-            "shooting_G/Sh": "goals_per_shot",
-            "shooting_G/SoT": "goals_per_shot_on_target",
-            "shooting_Dist": "average_shot_distance",
-            "shooting_FK": "free_kicks",
-            "shooting_PK": "penalties_scored",
-            "shooting_PKatt": "penalty_attempts",
-            "shooting_xG": "expected_goals",
-            "shooting_npxG": "non_penalty_expected_goals",
-            "shooting_npxG/Sh": "non_penalty_expected_goals_per_shot",
-            "misc_TklW": "tackles_won",
-            "misc_Int": "interceptions",
-            "misc_Recov": "recoveries",
-            "misc_Won": "duels_won",
-            "misc_Lost": "duels_lost",
-            "misc_Won%": "duel_win_pct",
-            "misc_Fls": "fouls_committed",
-            "misc_Fld": "fouled",
-            "misc_Off": "offsides",
-            "misc_Crs": "crosses",
-            "misc_CrdY": "yellow_cards",
-            "misc_2CrdY": "second_yellow_cards",
-            "misc_CrdR": "red_cards",
-            "misc_OG": "own_goals",
-            "misc_PKwon": "penalties_won",
-            "misc_PKcon": "penalties_conceded",
-            "standard_stats_PrgC": "progressive_carries",
-            "standard_stats_PrgP": "progressive_passes",
-            "standard_stats_PrgR": "progressive_receives",
-            "keepers_Saves": "saves",
-            "keepers_SoTA": "shots_on_target_against",
-            "keepers_GA": "goals_against",
-            "keepers_GA90": "goals_against_per_90",
-            "keepers_CS": "clean_sheets",
-            "keepers_CS%": "clean_sheet_pct",
-            "keepers_PKA": "penalties_against",
-            "keepers_PKatt": "penalties_faced",
-            "keepers_PKsv": "penalties_saved",
-            "keepers_PKm": "penalties_missed",
-            "keepers_W": "wins",
-            "keepers_D": "draws",
-            "keepers_L": "losses",
-        }
-        for player_dict in flattened_data:
-            for old_key, new_key in rename_map.items():
-                if old_key in player_dict:
-                    player_dict[new_key] = player_dict.pop(old_key)
-
-        # --- 5️⃣ Normalize nation ---
-        three_letter_codes = {
-            "engENG": "England",
-            "wlsWAL": "Wales",
-            "sctSCO": "Scotland",
-            "nirNIR": "Northern Ireland"
-        }
-        nation_map = {
-            "en": "England", "nl": "Netherlands", "fr": "France", "br": "Brazil", "es": "Spain",
-            "pt": "Portugal", "de": "Germany", "dk": "Denmark", "ar": "Argentina", "wls": "Wales",
-            "it": "Italy", "be": "Belgium", "sct": "Scotland", "se": "Sweden", "ie": "Republic of Ireland",
-            "no": "Norway", "ci": "Côte d'Ivoire", "sn": "Senegal", "ng": "Nigeria", "ch": "Switzerland",
-            "us": "United States", "nir": "Northern Ireland", "cm": "Cameroon", "jp": "Japan", "co": "Colombia",
-            "ma": "Morocco", "rs": "Serbia", "cd": "Congo DR", "uy": "Uruguay", "cz": "Czech Republic",
-            "mx": "Mexico", "gh": "Ghana", "hu": "Hungary", "eg": "Egypt", "ua": "Ukraine", "py": "Paraguay",
-            "tr": "Türkiye", "pl": "Poland", "kr": "Korea Republic", "si": "Slovenia", "at": "Austria",
-            "hr": "Croatia", "ec": "Ecuador", "mz": "Mozambique", "sk": "Slovakia", "zw": "Zimbabwe",
-            "za": "South Africa", "gm": "Gambia", "nz": "New Zealand", "tn": "Tunisia", "dz": "Algeria",
-            "bg": "Bulgaria", "gw": "Guinea-Bissau", "bf": "Burkina Faso", "ht": "Haiti", "pe": "Peru",
-            "uz": "Uzbekistan", "gr": "Greece", "ge": "Georgia", "is": "Iceland", "il": "Israel",
-            "jm": "Jamaica", "tt": "Trinidad and Tobago"
-        }
-
-        for player_dict in flattened_data:
-            raw_nation = player_dict.get("nation", "")
-            if raw_nation in three_letter_codes:
-                player_dict["nation"] = three_letter_codes[raw_nation]
-            elif raw_nation:
-                code = raw_nation[:2].lower()
-                player_dict["nation"] = nation_map.get(code, raw_nation)
-            else:
-                player_dict["nation"] = None
-
-        for player_dict in flattened_data:
-            player_dict['player'] = self.remove_accents(player_dict.get('player', ''))
-
-
-        # --- 6️⃣ Save JSON ---
-        with open(save_file, 'w', encoding='utf-8') as f:
-            json.dump(flattened_data, f, indent=2, ensure_ascii=False)
+        # --- 2️⃣ Finalize and write each player as we go ---
+        # Write next to the target and swap it in at the end, so a crash mid-way never leaves the
+        # chat server with a truncated snapshot
+        records = [] if build_dataframe else None
+        tmp_file = save_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                if output_format == 'json':
+                    f.write('[')
+                written = 0
+                for key in list(player_index):
+                    player_dict = self.finalize_player(player_index.pop(key))
+                    if output_format == 'json':
+                        # Byte-for-byte what json.dump(all_records, indent=2) would have produced
+                        f.write(',\n  ' if written else '\n  ')
+                        f.write(json.dumps(player_dict, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+                    else:
+                        f.write(json.dumps(player_dict, ensure_ascii=False))
+                        f.write('\n')
+                    written += 1
+                    if records is not None:
+                        records.append(player_dict)
+                if output_format == 'json':
+                    f.write('\n]' if written else ']')
+            os.replace(tmp_file, save_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
         print(f"\nFlattened and cleaned data saved to {save_file}")
 
-        # --- 7️⃣ Convert to DataFrame ---
-        df = pd.DataFrame(flattened_data)
-
-        return df
-
-
-
-
+        # --- 3️⃣ Convert to DataFrame (only if asked) ---
+        if records is None:
+            return None
+        return pd.DataFrame(records)
 
 
 if __name__ == "__main__":
@@ -286,8 +311,10 @@ if __name__ == "__main__":
 
     # Update the save_file path to point to your public folder
     save_path = '../chatbot-sports/backend/player_stats.json'
-    df = scraper.scrape_and_flatten(urls, save_file=save_path)
+    scraper.scrape_and_flatten(urls, save_file=save_path)
 
+    # Pass build_dataframe=True to get a DataFrame back as well:
+    #df = scraper.scrape_and_flatten(urls, save_file=save_path, build_dataframe=True)
     #print(f"\nDataFrame shape: {df.shape}")
     #print(df.head())
 
@@ -0,0 +1,218 @@
+import hashlib
+import logging
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# ---------------------------
+# Phrase encoder
+# ---------------------------
+# Hashed bag of words + character trigrams, projected into a fixed number of dimensions.
+# It runs on CPU with no model download, is stable across runs (crc32, not hash()), and
+# tolerates plurals ("bookings" ~ "booked"). Paraphrase coverage comes from the descriptions
+# below, which are embedded alongside the STAT_SYNONYMS phrases. Typos ("asists") go through a
+# second, character-trigram-only matrix over the single-word phrases.
+DIM = 512
+WORD_WEIGHT = 1.0
+CHAR_WEIGHT = 0.35
+TYPO_MIN_LEN = 5
+
+MATRIX_PATH = os.path.join(os.path.dirname(__file__), "stat_embeddings.npz")
+
+logger = logging.getLogger(__name__)
+
+STOP_WORDS = {
+    "a", "an", "the", "of", "for", "in", "at", "on", "to", "by", "is", "are", "was", "has", "have",
+    "had", "does", "do", "did", "he", "his", "him", "they", "their", "how", "many", "much", "what",
+    "which", "who", "and", "or", "this", "that", "season", "so", "far", "me", "show", "tell",
+}
+
+# Extra ways people describe a stat. Keys are canonical stats (same values as STAT_SYNONYMS).
+STAT_DESCRIPTIONS: Dict[str, List[str]] = {
+    "team": ["plays for which club", "current club", "which squad does he play in"],
+    "position": ["playing position", "where does he play"],
+    "age": ["years old"],
+    "nation": ["where is he from", "national side", "citizenship"],
+    "matches_played": ["games played", "matches played", "times played", "number of games"],
+    "starts": ["games started", "times started", "starting lineups", "in the starting eleven"],
+    "minutes_played": ["time on the pitch", "minutes on the pitch", "playing time"],
+    "goals": ["times scored", "times he found the net", "hit the net", "goal tally", "goals scored", "netted"],
+    "non_penalty_goals": ["goals excluding penalties", "open play goals", "non pen goals"],
+    "goals_per_90": ["goals per game", "scoring rate", "goals per match"],
+    "assists": ["set up goals", "assisted", "goal assists", "chances converted by teammates"],
+    "assists_per_90": ["assists per game", "assists per match"],
+    "goal_involvements": ["goals and assists", "goals plus assists", "direct goal involvements"],
+    "expected_goals": ["expected scoring", "quality of chances", "x goals"],
+    "expected_assists": ["expected assisted goals", "quality of chances created"],
+    "shots": ["attempts on goal", "shots taken", "times he shot", "efforts on goal"],
+    "shots_on_target": ["hit the target", "times he hit the target", "shots on goal", "efforts on target"],
+    "shots_on_target_pct": ["shooting accuracy", "percentage of shots on target"],
+    "average_shot_distance": ["how far he shoots from", "shot distance"],
+    "free_kicks": ["free kick goals", "set piece shots"],
+    "penalties_scored": ["penalty goals", "spot kicks scored", "converted penalties"],
+    "penalty_attempts": ["penalties taken", "spot kicks taken"],
+    "progressive_carries": ["dribbles forward", "carried the ball forward", "ball carries"],
+    "progressive_passes": ["forward passes", "line breaking passes"],
+    "progressive_receives": ["forward runs", "received progressive passes"],
+    "crosses": ["balls into the box", "delivered crosses"],
+    "tackles_won": ["successful tackles", "tackles made", "won the ball back"],
+    "interceptions": ["intercepted", "cut out passes"],
+    "recoveries": ["ball recoveries", "regained possession"],
+    "duels_won": ["aerial duels won", "headers won", "won in the air"],
+    "duels_lost": ["aerial duels lost", "headers lost"],
+    "fouls_committed": ["fouls made", "fouls conceded", "times he fouled"],
+    "fouled": ["times fouled", "fouls won", "fouls drawn", "fouls suffered"],
+    "offsides": ["caught offside", "times offside"],
+    "yellow_cards": ["times booked", "bookings", "booked", "cautions", "cautioned", "yellows"],
+    "red_cards": ["sent off", "sendings off", "times sent off", "dismissals", "red carded"],
+    "own_goals": ["scored against his own team", "own net"],
+    "penalties_won": ["penalties earned", "won a penalty"],
+    "penalties_conceded": ["gave away penalties", "penalties given away"],
+    "saves": ["saves made", "shots stopped", "shot stopping"],
+    "goals_against": ["goals conceded", "goals let in"],
+    "clean_sheets": ["shutouts", "games without conceding", "kept a clean sheet"],
+    "wins": ["games won", "matches won", "victories"],
+    "draws": ["games drawn", "matches drawn", "tied games"],
+    "losses": ["games lost", "matches lost", "defeats"],
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9%+/]+", text.lower())
+
+
+def _bucket(feature: str) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % DIM, (1.0 if (h >> 16) & 1 else -1.0)
+
+
+@lru_cache(maxsize=65536)
+def encode(phrase: str) -> np.ndarray:
+    """L2-normalised float32 vector for a phrase."""
+    vec = np.zeros(DIM, dtype=np.float32)
+    for word in tokenize(phrase):
+        if word in STOP_WORDS:
+            continue
+        idx, sign = _bucket("w:" + word)
+        vec[idx] += sign * WORD_WEIGHT
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            idx, sign = _bucket("c:" + padded[i:i + 3])
+            vec[idx] += sign * CHAR_WEIGHT
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+def encode_batch(phrases: List[str]) -> np.ndarray:
+    if not phrases:
+        return np.zeros((0, DIM), dtype=np.float32)
+    return np.stack([encode(p) for p in phrases])
+
+
+@lru_cache(maxsize=65536)
+def encode_chars(word: str) -> np.ndarray:
+    """Character trigrams only: "asists" and "assists" share most of their vector."""
+    vec = np.zeros(DIM, dtype=np.float32)
+    padded = f"<{word.lower()}>"
+    for i in range(len(padded) - 2):
+        idx, sign = _bucket("c:" + padded[i:i + 3])
+        vec[idx] += sign
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+def encode_chars_batch(words: List[str]) -> np.ndarray:
+    if not words:
+        return np.zeros((0, DIM), dtype=np.float32)
+    return np.stack([encode_chars(w) for w in words])
+
+
+# ---------------------------
+# Precomputed phrase matrix
+# ---------------------------
+def phrase_table(synonyms: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    phrases, labels = [], []
+    for phrase, canon in synonyms.items():
+        phrases.append(phrase)
+        labels.append(canon)
+    for canon, descs in STAT_DESCRIPTIONS.items():
+        phrases.append(canon.replace("_", " "))
+        labels.append(canon)
+        for d in descs:
+            phrases.append(d)
+            labels.append(canon)
+    return phrases, labels
+
+
+def typo_table(phrases: List[str], labels: List[str]) -> Tuple[List[str], List[str]]:
+    """Single-word phrases (long enough that a couple of typos still leave trigrams in common)."""
+    words, word_labels = [], []
+    for phrase, canon in zip(phrases, labels):
+        toks = tokenize(phrase)
+        if len(toks) == 1 and len(toks[0]) >= TYPO_MIN_LEN and toks[0] not in words:
+            words.append(toks[0])
+            word_labels.append(canon)
+    return words, word_labels
+
+
+def table_fingerprint(phrases: List[str], labels: List[str]) -> str:
+    key = f"{DIM}|{WORD_WEIGHT}|{CHAR_WEIGHT}|{TYPO_MIN_LEN}|" + "|".join(f"{p}={l}" for p, l in zip(phrases, labels))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+StatMatrices = Tuple[np.ndarray, List[str], np.ndarray, List[str]]
+
+
+def build_matrix(synonyms: Dict[str, str], path: str = MATRIX_PATH) -> StatMatrices:
+    """Phrase matrix + labels, and the char-trigram matrix + labels for single-word typo matching."""
+    phrases, labels = phrase_table(synonyms)
+    words, word_labels = typo_table(phrases, labels)
+    matrix, typo_matrix = encode_batch(phrases), encode_chars_batch(words)
+    np.savez_compressed(path, matrix=matrix, labels=np.array(labels),
+                        typo_matrix=typo_matrix, typo_labels=np.array(word_labels),
+                        fingerprint=table_fingerprint(phrases, labels))
+    return matrix, labels, typo_matrix, word_labels
+
+
+def load_matrix(synonyms: Dict[str, str], path: str = MATRIX_PATH) -> StatMatrices:
+    """Load the offline-built matrix. Never rebuilds: a missing or stale file is an error."""
+    phrases, labels = phrase_table(synonyms)
+    if not os.path.exists(path):
+        raise RuntimeError(f"{path} is missing; build it with 'python stat_embeddings.py'")
+    with np.load(path) as saved:
+        fingerprint = str(saved["fingerprint"])
+        if fingerprint != table_fingerprint(phrases, labels):
+            logger.error("Stale stat embedding matrix %s (fingerprint %s does not match the phrase table)",
+                         path, fingerprint[:12])
+            raise RuntimeError(f"{path} is out of date; rebuild it with 'python stat_embeddings.py'")
+        return (saved["matrix"], [str(l) for l in saved["labels"]],
+                saved["typo_matrix"], [str(l) for l in saved["typo_labels"]])
+
+
+def query_ngrams(text: str, max_n: int = 4) -> List[str]:
+    words = tokenize(text)
+    grams = []
+    for n in range(1, max_n + 1):
+        for i in range(len(words) - n + 1):
+            gram = words[i:i + n]
+            # Stop-word edges only dilute the vector ("the target" vs "target")
+            if gram[0] in STOP_WORDS or gram[-1] in STOP_WORDS:
+                continue
+            grams.append(" ".join(gram))
+    return grams
+
+
+if __name__ == "__main__":
+    # Offline build: python stat_embeddings.py
+    from stat_synonyms import STAT_SYNONYMS
+    matrix, labels, typo_matrix, _ = build_matrix(STAT_SYNONYMS)
+    print(f"Saved {matrix.shape[0]} phrase embeddings and {typo_matrix.shape[0]} typo vectors "
+          f"({matrix.shape[1]} dims) to {MATRIX_PATH}")
@@ -1,25 +1,100 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import './chatInput.css';
 
+const SUGGEST_URL = 'http://localhost:5000/suggest';
+
 const ChatInput = ({ onSend }) => {
   const [message, setMessage] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
+  const [fragment, setFragment] = useState('');
+  const [highlighted, setHighlighted] = useState(-1);
+  const [entities, setEntities] = useState([]);   // picked suggestions, sent with the message
+
+  // Fetch suggestions for what's being typed (debounced, stale requests aborted)
+  useEffect(() => {
+    if (!message.trim() || message.endsWith(' ')) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const res = await fetch(`${SUGGEST_URL}?q=${encodeURIComponent(message)}`, { signal: controller.signal });
+        const data = await res.json();
+        setSuggestions(data.suggestions || []);
+        setFragment(data.fragment || '');
+        setHighlighted(-1);
+      } catch (error) {
+        if (error.name !== 'AbortError') setSuggestions([]);
+      }
+    }, 120);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [message]);
+
+  const pickSuggestion = (s) => {
+    const base = fragment && message.endsWith(fragment) ? message.slice(0, -fragment.length) : message;
+    setMessage(`${base}${s.text} `);
+    setEntities((prev) => [...prev.filter((e) => e.value !== s.value), { type: s.type, value: s.value, text: s.text }]);
+    setSuggestions([]);
+  };
 
   const handleSend = () => {
     const trimmed = message.trim();
     if (trimmed !== '') {
-      onSend(trimmed);   // ✅ send message to App
+      // Only keep entities whose text is still in the message
+      const resolved = entities
+        .filter((e) => trimmed.includes(e.text))
+        .map(({ type, value }) => ({ type, value }));
+      onSend(trimmed, resolved);   // ✅ send message to App
       setMessage('');
+      setEntities([]);
+      setSuggestions([]);
     }
   };
 
   return (
     <div className="chat-input-container">
+      {suggestions.length > 0 && (
+        <ul className="suggestions">
+          {suggestions.map((s, i) => (
+            <li
+              key={`${s.type}-${s.value}`}
+              className={`suggestion ${i === highlighted ? 'active' : ''}`}
+              onMouseDown={(e) => {
+                e.preventDefault();
+                pickSuggestion(s);
+              }}
+            >
+              <span>{s.text}</span>
+              <span className="suggestion-type">{s.type}</span>
+            </li>
+          ))}
+        </ul>
+      )}
       <textarea
         className="chat-textarea"
         placeholder="Type your message..."
         value={message}
         onChange={(e) => setMessage(e.target.value)}
         onKeyDown={(e) => {
+          if (suggestions.length > 0 && (e.key === 'ArrowDown' || e.key === 'ArrowUp')) {
+            e.preventDefault();
+            const step = e.key === 'ArrowDown' ? 1 : -1;
+            setHighlighted((h) => (h + step + suggestions.length) % suggestions.length);
+            return;
+          }
+          if (e.key === 'Escape') {
+            setSuggestions([]);
+            return;
+          }
+          if ((e.key === 'Enter' || e.key === 'Tab') && highlighted >= 0 && suggestions[highlighted]) {
+            e.preventDefault();
+            pickSuggestion(suggestions[highlighted]);
+            return;
+          }
           if (e.key === 'Enter' && !e.shiftKey) {
             e.preventDefault();
             handleSend();
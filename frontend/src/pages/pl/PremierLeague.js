@@ -2,6 +2,28 @@ import React, { useState, useRef, useEffect } from "react";
 import ChatInput from "../../components/chatInput/chatInput";
 import "./PremierLeague.css";
 
+// Only keep the recent history around so localStorage writes stay small
+const MAX_STORED_MESSAGES = 100;
+const saveMessages = (msgs) => {
+  localStorage.setItem("plMessages", JSON.stringify(msgs.slice(-MAX_STORED_MESSAGES)));
+};
+
+// Answers we already have, keyed by request URL, revalidated with If-None-Match
+const answerCache = new Map();
+
+const fetchAnswer = async (url) => {
+  const cached = answerCache.get(url);
+  const res = await fetch(url, {
+    cache: "no-store",   // we do the revalidation ourselves
+    headers: cached ? { "If-None-Match": cached.etag } : {},
+  });
+  if (res.status === 304 && cached) return cached.data;
+  const data = await res.json();
+  const etag = res.headers.get("ETag");
+  if (res.ok && etag) answerCache.set(url, { etag, data });
+  return data;
+};
+
 const PremierLeague = () => {
   // Load messages from localStorage if available
   const [messages, setMessages] = useState(() => {
@@ -12,7 +34,8 @@ const PremierLeague = () => {
   const messagesEndRef = useRef(null);
 
   // Send user message to backend (Flask API)
-  const handleSend = async (text) => {
+  // `entities` are players/teams/stats already resolved by the typeahead
+  const handleSend = async (text, entities = []) => {
     if (!text.trim()) return;
     const timestamp = new Date().toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" });
     const userMessage = { text, sender: "user", timestamp };
@@ -20,26 +43,22 @@ const PremierLeague = () => {
     // Add user message to chat first
     const newMessages = [...messages, userMessage];
     setMessages(newMessages);
-    localStorage.setItem("plMessages", JSON.stringify(newMessages));
+    saveMessages(newMessages);
 
     try {
-      const res = await fetch("http://localhost:5000/chat", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ query: text }),
-      });
-
-      const data = await res.json();
+      const params = new URLSearchParams({ query: text });
+      if (entities.length) params.set("entities", JSON.stringify(entities));
+      const data = await fetchAnswer(`http://localhost:5000/chat?${params}`);
       const botMessage = { text: data.response, sender: "bot" };
 
       const updatedMessages = [...newMessages, botMessage];
       setMessages(updatedMessages);
-      localStorage.setItem("plMessages", JSON.stringify(updatedMessages));
+      saveMessages(updatedMessages);
     } catch (error) {
       const botMessage = { text: "⚠️ Error connecting to server.", sender: "bot" };
       const updatedMessages = [...newMessages, botMessage];
       setMessages(updatedMessages);
-      localStorage.setItem("plMessages", JSON.stringify(updatedMessages));
+      saveMessages(updatedMessages);
     }
   };
 